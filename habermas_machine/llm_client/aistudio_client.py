@@ -16,6 +16,7 @@
 """Language Model that uses GDM AI Studio API."""
 
 from collections.abc import Collection, Mapping, Sequence
+import logging
 import os
 import time
 
@@ -25,6 +26,7 @@ from typing_extensions import override
 from habermas_machine.llm_client import base_client
 from habermas_machine.llm_client import utils
 
+_LOG = logging.getLogger(__name__)
 
 DEFAULT_SAFETY_SETTINGS = (
     {
@@ -96,7 +98,7 @@ class AIStudioClient(base_client.LLMClient):
     self._n_calls += 1
     if self._sleep_periodically and (
         self._n_calls % self._calls_between_sleeping == 0):
-      print('Sleeping for 10 seconds...')
+      _LOG.debug('rate-limit sleep %ds', 10)
       time.sleep(10)
 
     sample = self._model.generate_content(
@@ -112,10 +114,13 @@ class AIStudioClient(base_client.LLMClient):
     try:
       # AI Studio returns a list of parts, but we only use the first one.
       response = sample.candidates[0].content.parts[0].text
-    except ValueError as e:
-      print('An error occurred: ', e)
-      print(f'prompt: {prompt}')
-      print(f'sample: {sample}')
+    except ValueError:
+      # We log a hash rather than the prompt, which may contain personal data.
+      _LOG.exception(
+          'AI Studio call failed (model=%s, prompt_hash=%s).',
+          self._model_name,
+          utils.prompt_hash(prompt),
+      )
       response = ''
     return utils.truncate(response, delimiters=terminators)
 
@@ -0,0 +1,136 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Response caches for deterministic LLM samples."""
+
+import abc
+import functools
+import logging
+import os
+import threading
+
+import blake3
+import cachetools
+import orjson
+
+DEFAULT_MAXSIZE = 10_000
+DEFAULT_TTL_SECONDS = 3600
+# Length of the keys' digests in bytes.
+KEY_DIGEST_SIZE = 16
+# Environment variable holding the Redis URL of the shared cache, if any.
+REDIS_URL_ENV_VAR = 'POE_CACHE_REDIS'
+
+_LOG = logging.getLogger(__name__)
+
+
+def make_key(**fields) -> str:
+  """Returns a content hash of the given request fields.
+
+  The fields are serialized to canonical JSON (sorted keys, no whitespace),
+  so the key is the same across processes and platforms.
+
+  Args:
+    **fields: JSON-serializable fields that determine the response.
+
+  Returns:
+    A hex string with 2 * KEY_DIGEST_SIZE characters.
+  """
+  payload = orjson.dumps(fields, option=orjson.OPT_SORT_KEYS)
+  return blake3.blake3(payload).hexdigest(KEY_DIGEST_SIZE)
+
+
+class CacheBackend(abc.ABC):
+  """Key-value store for responses."""
+
+  @abc.abstractmethod
+  def get(self, key: str) -> str | None:
+    """Returns the value stored under key or None if there is none."""
+
+  @abc.abstractmethod
+  def set(self, key: str, value: str) -> None:
+    """Stores value under key."""
+
+
+class InMemoryLRU(CacheBackend):
+  """Process-local LRU cache whose entries expire after a fixed time."""
+
+  def __init__(
+      self,
+      maxsize: int = DEFAULT_MAXSIZE,
+      ttl: float = DEFAULT_TTL_SECONDS,
+  ) -> None:
+    self._cache = cachetools.TTLCache(maxsize=maxsize, ttl=ttl)
+    # cachetools caches are not thread-safe.
+    self._lock = threading.Lock()
+
+  def get(self, key: str) -> str | None:
+    with self._lock:
+      return self._cache.get(key)
+
+  def set(self, key: str, value: str) -> None:
+    with self._lock:
+      self._cache[key] = value
+
+
+class RedisBackend(CacheBackend):
+  """Cache shared between processes through Redis.
+
+  The cache is best-effort: Redis errors are logged and treated as misses, so
+  that an outage does not fail requests.
+  """
+
+  def __init__(self, url: str, ttl: float = DEFAULT_TTL_SECONDS) -> None:
+    """Initializes the instance.
+
+    Args:
+      url: Redis URL, e.g. 'redis://localhost:6379/0'.
+      ttl: Time to live of each entry in seconds.
+    """
+    try:
+      import redis  # pylint: disable=g-import-not-at-top
+    except ImportError as e:
+      raise ImportError(
+          'RedisBackend requires the redis package: pip install redis'
+      ) from e
+    self._redis = redis.Redis.from_url(url)
+    self._redis_error = redis.RedisError
+    self._ttl = int(ttl)
+
+  def get(self, key: str) -> str | None:
+    try:
+      value = self._redis.get(key)
+    except self._redis_error:
+      _LOG.warning('Redis cache lookup failed.', exc_info=True)
+      return None
+    return None if value is None else value.decode()
+
+  def set(self, key: str, value: str) -> None:
+    try:
+      self._redis.set(key, value, ex=self._ttl)
+    except self._redis_error:
+      _LOG.warning('Redis cache store failed.', exc_info=True)
+
+
+@functools.cache
+def default_backend() -> CacheBackend:
+  """Returns the process-wide cache.
+
+  Uses Redis if the POE_CACHE_REDIS environment variable holds a URL and an
+  in-memory LRU cache otherwise.
+  """
+  url = os.environ.get(REDIS_URL_ENV_VAR)
+  if url:
+    return RedisBackend(url)
+  return InMemoryLRU()
@@ -0,0 +1,96 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+import sys
+import types
+from unittest import mock
+
+from absl.testing import absltest
+
+from habermas_machine.llm_client import cache
+
+
+class MakeKeyTest(absltest.TestCase):
+
+  def test_key_is_independent_of_field_order(self):
+    self.assertEqual(
+        cache.make_key(a=1, b='x'), cache.make_key(b='x', a=1))
+
+  def test_key_depends_on_values(self):
+    self.assertNotEqual(cache.make_key(a=1), cache.make_key(a=2))
+
+  def test_key_is_stable(self):
+    # Keys are shared between processes, e.g. through Redis, so they must not
+    # change between runs.
+    self.assertEqual(
+        cache.make_key(prompt='hello', terminators=('</answer>',)),
+        '50fc8909dd15bdef910937d0ac3621be',
+    )
+
+
+class InMemoryLRUTest(absltest.TestCase):
+
+  def test_get_missing_returns_none(self):
+    self.assertIsNone(cache.InMemoryLRU().get('missing'))
+
+  def test_set_and_get(self):
+    backend = cache.InMemoryLRU()
+    backend.set('key', 'value')
+    self.assertEqual(backend.get('key'), 'value')
+
+  def test_evicts_least_recently_used(self):
+    backend = cache.InMemoryLRU(maxsize=2)
+    backend.set('a', '1')
+    backend.set('b', '2')
+    backend.get('a')
+    backend.set('c', '3')
+    self.assertEqual(backend.get('a'), '1')
+    self.assertIsNone(backend.get('b'))
+    self.assertEqual(backend.get('c'), '3')
+
+
+
+class RedisBackendTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    # The redis package is optional, so we fake the parts that we use.
+    self.client = mock.Mock()
+    fake_redis = types.ModuleType('redis')
+    fake_redis.RedisError = type('RedisError', (Exception,), {})
+    fake_redis.Redis = mock.Mock()
+    fake_redis.Redis.from_url.return_value = self.client
+    self.redis_error = fake_redis.RedisError
+    self.enter_context(mock.patch.dict(sys.modules, {'redis': fake_redis}))
+
+  def test_set_and_get(self):
+    backend = cache.RedisBackend('redis://mock', ttl=10)
+    self.client.get.return_value = b'value'
+    backend.set('key', 'value')
+    self.assertEqual(backend.get('key'), 'value')
+    self.client.set.assert_called_once_with('key', 'value', ex=10)
+
+  def test_errors_are_logged_and_ignored(self):
+    backend = cache.RedisBackend('redis://mock')
+    self.client.get.side_effect = self.redis_error('down')
+    self.client.set.side_effect = self.redis_error('down')
+    with self.assertLogs(cache.__name__, 'WARNING') as logs:
+      self.assertIsNone(backend.get('key'))
+      backend.set('key', 'value')
+    self.assertLen(logs.records, 2)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -1,60 +1,654 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Language Model that uses the Poe API.
+
+Poe exposes an OpenAI-compatible endpoint, so we talk to it through the
+`openai` SDK. The SDK is only imported once a client is created, so importing
+this module stays cheap for processes that use other backends.
 """
-This module provides a client for interacting with language models via the Poe API.
-It replaces the original implementation that used the Google AI Studio (Gemini) API.
-"""
 
-from collections.abc import Collection
+from __future__ import annotations
+
+import asyncio
+import atexit
+from collections.abc import Collection, Coroutine, Iterator, Mapping, Sequence
+import concurrent.futures
+import contextlib
+import dataclasses
+import functools
+import logging
 import os
+import threading
 import time
-import openai
+import types
+from typing import Any, Literal, TYPE_CHECKING
+import weakref
 
-# The 'poe-api' library is used to interact with Poe.
-# You can install it with: pip install poe-api
-from openai import OpenAI
+import orjson
+import tenacity
 from typing_extensions import override
 
 from habermas_machine.llm_client import base_client
+from habermas_machine.llm_client import cache as cache_lib
+from habermas_machine.llm_client import rate_limiter
+from habermas_machine.llm_client import semantic_cache as semantic_cache_lib
 from habermas_machine.llm_client import utils
 
+if TYPE_CHECKING:
+  import openai  # pylint: disable=g-bad-import-order
+
+__all__ = ['ClientStats', 'PoeClient']
+
+POE_BASE_URL = 'https://api.poe.com/v1'
+SYSTEM_PROMPT = 'You are a helpful assistant.'
+# Maximum number of requests in flight when sampling several prompts at once.
+DEFAULT_CONCURRENCY = 32
+# Environment variable overriding the number of threads used by `map`.
+PARALLELISM_ENV_VAR = 'POE_PARALLELISM'
+# Connection pool limits of the shared sync client. httpx defaults to 100
+# connections, which throttles large fan-outs.
+MAX_CONNECTIONS = 2000
+MAX_KEEPALIVE_CONNECTIONS = 1000
+KEEPALIVE_EXPIRY_SECONDS = 60
+CLIENT_TIMEOUT_SECONDS = 120.0
+# The OpenAI API accepts at most this many stop sequences.
+MAX_STOP_SEQUENCES = 4
+# Retry configuration for transient API errors.
+MAX_ATTEMPTS = 5
+MAX_RETRY_WAIT_SECONDS = 30
+
+BATCH_ENDPOINT = '/v1/chat/completions'
+BATCH_COMPLETION_WINDOW = '24h'
+# Polling a batch backs off exponentially between these intervals.
+BATCH_POLL_INITIAL_SECONDS = 10
+BATCH_POLL_MAX_SECONDS = 600
+# Statuses after which a batch no longer changes.
+_BATCH_FINAL_STATUSES = frozenset(
+    {'completed', 'failed', 'expired', 'cancelled'})
+
+_LOG = logging.getLogger(__name__)
+
+
+def _is_retryable(error: BaseException) -> bool:
+  """Returns whether a failed request may succeed when retried."""
+  # pylint: disable=g-import-not-at-top,redefined-outer-name
+  import httpx
+  import openai
+  # pylint: enable=g-import-not-at-top,redefined-outer-name
+  if isinstance(error, (openai.APIConnectionError, openai.RateLimitError)):
+    return True
+  # The SDK only wraps errors raised while sending the request. Errors raised
+  # while reading a streamed response come from the transport unwrapped.
+  if isinstance(error, httpx.TransportError):
+    return True
+  try:
+    import aiohttp  # pylint: disable=g-import-not-at-top
+  except ImportError:
+    pass
+  else:
+    if isinstance(error, aiohttp.ClientError):
+      return True
+  # Client errors such as bad requests or authentication errors are permanent.
+  return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+_retry = tenacity.retry(
+    wait=tenacity.wait_random_exponential(
+        multiplier=1, max=MAX_RETRY_WAIT_SECONDS),
+    stop=tenacity.stop_after_attempt(MAX_ATTEMPTS),
+    retry=tenacity.retry_if_exception(_is_retryable),
+    before_sleep=tenacity.before_sleep_log(_LOG, logging.WARNING),
+    reraise=True,
+)
+
+
+@functools.cache
+def _get_client(api_key: str, base_url: str) -> openai.OpenAI:
+  """Returns a process-wide client for the given key and endpoint.
+
+  Sharing the client between `PoeClient` instances lets them reuse pooled
+  TCP+TLS connections instead of paying for a new handshake per instance.
+  The cache is unbounded because the configured keys are few and fixed;
+  evicting clients would only rebuild their pools.
+
+  Args:
+    api_key: Poe API key.
+    base_url: Base URL of the OpenAI-compatible endpoint.
+  """
+  # pylint: disable=g-import-not-at-top,redefined-outer-name
+  import httpx
+  import openai
+  # pylint: enable=g-import-not-at-top,redefined-outer-name
+  client = openai.OpenAI(
+      api_key=api_key,
+      base_url=base_url,
+      max_retries=0,  # Retries are handled by PoeClient.
+      # httpx advertises every content encoding it can decode, so installing
+      # httpx[brotli,zstd] is enough to negotiate compressed responses.
+      http_client=openai.DefaultHttpxClient(
+          limits=httpx.Limits(
+              max_connections=MAX_CONNECTIONS,
+              max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+              keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+          ),
+          timeout=httpx.Timeout(CLIENT_TIMEOUT_SECONDS),
+      ),
+  )
+  atexit.register(client.close)
+  return client
+
+
+def _stop_sequences(terminators: Collection[str]) -> list[str] | None:
+  """Returns the stop sequences to send with a request.
+
+  The server stops generating at these sequences, which saves output tokens.
+  Only the first MAX_STOP_SEQUENCES terminators are sent; the responses are
+  still truncated at the remaining ones on our side.
+
+  Args:
+    terminators: Strings that end the response.
+  """
+  return list(terminators)[:MAX_STOP_SEQUENCES] or None
+
+
+def _run_sync(coroutine: Coroutine[Any, Any, Any]) -> Any:
+  """Runs a coroutine to completion from synchronous code."""
+  try:
+    asyncio.get_running_loop()
+  except RuntimeError:
+    return asyncio.run(coroutine)
+  # asyncio.run cannot be nested in a running event loop (e.g. in a notebook),
+  # so we run the coroutine in its own thread.
+  with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+    return executor.submit(asyncio.run, coroutine).result()
+
+
+def _new_async_client(api_key: str, base_url: str) -> openai.AsyncOpenAI:
+  """Returns an async client using the aiohttp transport.
+
+  httpx's AsyncClient does not scale well with many in-flight requests, so we
+  use the aiohttp transport shipped with `openai[aiohttp]` instead.
+
+  Args:
+    api_key: Poe API key.
+    base_url: Base URL of the OpenAI-compatible endpoint.
+  """
+  import openai  # pylint: disable=g-import-not-at-top,redefined-outer-name
+  return openai.AsyncOpenAI(
+      api_key=api_key,
+      base_url=base_url,
+      max_retries=0,  # Retries are handled by PoeClient.
+      http_client=openai.DefaultAioHttpClient(),
+  )
+
+
+@functools.cache
+def _prometheus_counter() -> Any:
+  """Returns a Prometheus counter of client events, or None.
+
+  The counter is only created if prometheus_client is installed.
+  """
+  try:
+    import prometheus_client  # pylint: disable=g-import-not-at-top
+  except ImportError:
+    return None
+  return prometheus_client.Counter(
+      'poe_client_events', 'Events of Poe API clients.', ['model', 'event'])
+
+
+@dataclasses.dataclass
+class ClientStats:
+  """Counters describing the traffic of a client.
+
+  Attributes:
+    cache_hits: Responses served from the exact cache.
+    semantic_cache_hits: Responses served from the semantic cache.
+    cache_misses: Cacheable requests that were sent to the API.
+    rate_limited: Attempts rejected with a rate limit error.
+    transient: Attempts that failed with another retryable error (connection
+      errors, timeouts and server errors).
+    bad_requests: Requests rejected as invalid, for which we return ''.
+  """
+  cache_hits: int = 0
+  semantic_cache_hits: int = 0
+  cache_misses: int = 0
+  rate_limited: int = 0
+  transient: int = 0
+  bad_requests: int = 0
+  model_name: str = dataclasses.field(default='', compare=False, repr=False)
+
+  def __post_init__(self) -> None:
+    # Not a field, so that `dataclasses.asdict` and copies skip it.
+    self._lock = threading.Lock()
+
+  def __getstate__(self) -> dict[str, Any]:
+    return self.snapshot() | {'model_name': self.model_name}
+
+  def __setstate__(self, state: dict[str, Any]) -> None:
+    self.__dict__.update(state)
+    self.__post_init__()
+
+  def snapshot(self) -> dict[str, int]:
+    """Returns a consistent copy of the counters."""
+    with self._lock:
+      return {
+          field.name: getattr(self, field.name)
+          for field in dataclasses.fields(self)
+          if field.name != 'model_name'
+      }
+
+  def increment(self, name: str) -> None:
+    """Atomically increments the counter with the given name."""
+    with self._lock:
+      setattr(self, name, getattr(self, name) + 1)
+    counter = _prometheus_counter()
+    if counter is not None:
+      counter.labels(model=self.model_name, event=name).inc()
+
+
+@dataclasses.dataclass
+class _Connection:
+  """API key with its own client and optional rate limit."""
+  api_key: str
+  client: openai.OpenAI
+  rate_limiter: rate_limiter.TokenBucket | None
+  in_flight: int = 0
+
+
+@dataclasses.dataclass
+class _AsyncState:
+  """Async clients and concurrency limit shared on one event loop."""
+  clients: dict[str, openai.AsyncOpenAI]
+  semaphore: asyncio.Semaphore
+
+
+def _api_keys_from_env() -> list[str]:
+  """Returns the Poe API keys configured in the environment.
+
+  POE_API_KEYS holds a comma-separated list of keys and takes precedence over
+  the single key in POE_API_KEY.
+  """
+  keys = os.environ.get('POE_API_KEYS', '')
+  keys = [key.strip() for key in keys.split(',') if key.strip()]
+  if not keys and os.environ.get('POE_API_KEY'):
+    keys = [os.environ['POE_API_KEY']]
+  if not keys:
+    # See https://poe.com/api_key.
+    raise EnvironmentError(
+        "Neither the 'POE_API_KEYS' nor the 'POE_API_KEY' environment "
+        'variable is set. Please set one of them to your Poe API key(s) '
+        '(https://poe.com/api_key).'
+    )
+  return keys
+
+
+class _TerminatorScanner:
+  """Accumulates streamed text and detects the first terminator.
+
+  Only the text that could contain a terminator ending in the newest delta is
+  scanned, so the cost per delta does not grow with the response length.
+  """
+
+  def __init__(self, terminators: Collection[str]) -> None:
+    self._terminators = [t for t in terminators if t]
+    self._overlap = max((len(t) for t in self._terminators), default=1) - 1
+    self._deltas = []
+    self._tail = ''
+
+  def feed(self, delta: str) -> bool:
+    """Adds a delta and returns whether the text contains a terminator."""
+    self._deltas.append(delta)
+    window = self._tail + delta
+    if any(t in window for t in self._terminators):
+      return True
+    self._tail = window[-self._overlap:] if self._overlap else ''
+    return False
+
+  @property
+  def text(self) -> str:
+    return ''.join(self._deltas)
+
 
 class PoeClient(base_client.LLMClient):
   """Language Model that uses the Poe API."""
 
+  # Shared by all requests that use the default system prompt. Read-only
+  # because every request references it.
+  _SYSTEM_MSG = types.MappingProxyType(
+      {'role': 'system', 'content': SYSTEM_PROMPT})
+  # Threads used by `map`, shared by all clients. Threads are only started
+  # once `map` is first called.
+  _pool = concurrent.futures.ThreadPoolExecutor(
+      max_workers=int(os.environ.get(PARALLELISM_ENV_VAR, DEFAULT_CONCURRENCY)),
+      thread_name_prefix='PoeClient',
+  )
+
   def __init__(
       self,
       model_name: str,
       *,
-      sleep_periodically: bool = False,
+      system_prompt: str | None = None,
+      few_shot: Sequence[tuple[str, str]] = (),
+      rpm: float | None = None,
+      tpm: float | None = None,
+      use_cache: bool = True,
+      cache: cache_lib.CacheBackend | None = None,
+      semantic_cache: semantic_cache_lib.SemanticCache | None = None,
+      legacy_completions: bool = False,
+      concurrency: int = DEFAULT_CONCURRENCY,
   ) -> None:
     """Initializes the instance.
 
     Args:
       model_name: Which Poe bot to use. This corresponds to the bot's name
         on poe.com, e.g., 'Claude-3-Opus', 'GPT-4', 'Llama-3-70b'.
-      sleep_periodically: Sleep between API calls to avoid potential rate limits.
+      system_prompt: System prompt sent with every request. Defaults to
+        SYSTEM_PROMPT.
+      few_shot: (user, assistant) message pairs sent after the system prompt
+        with every request.
+      rpm: Maximum number of requests per minute sent to the API per key, or
+        None (the default) to not limit the rate on the client side. Must be
+        given together with `tpm`.
+      tpm: Maximum number of tokens per minute sent to the API per key. Each
+        request is charged its prompt tokens plus its full `max_tokens`, so
+        the effective rate is at most tpm / max_tokens requests per minute,
+        e.g. about 21 with tpm=90_000 and the default max_tokens=4096.
+      use_cache: Whether to cache deterministic (temperature 0) responses.
+      cache: Cache to use. Defaults to the process-wide cache (see
+        `cache.default_backend`).
+      semantic_cache: Optional cache that also returns the responses of
+        paraphrased prompts. Like `cache`, it is only used for deterministic
+        (temperature 0) requests and is consulted after `cache`.
+      legacy_completions: Whether the bot supports the legacy completions
+        endpoint. If so, `sample_texts` sends all prompts in a single request
+        (without the system prompt).
+      concurrency: Maximum number of `sample_text_async` calls in flight at
+        any time on each event loop.
+
+    Requests are spread over all API keys in POE_API_KEYS (or the single key in
+    POE_API_KEY). With `rpm` and `tpm`, each key has its own rate limit, which
+    multiplies the effective rate limit by the number of keys.
+
+    Each request sends the system prompt and few-shot examples first and the
+    prompt last. Servers that cache shared prompt prefixes can then skip
+    recomputing them, so callers should move any static preamble from the
+    prompt into `system_prompt` or `few_shot`.
     """
-    # The Poe API key is the 'p-b' cookie value from poe.com.
-    # It is recommended to store this token in an environment variable.
-    try:
-        self._api_key = os.environ['POE_API_KEY']
-    except KeyError:
-        raise EnvironmentError(
-            "The 'POE_API_KEY' environment variable is not set. "
-            "Please set it to your Poe 'p-b' cookie value."
+    self._model_name = model_name
+    if system_prompt is None:
+      system_message = self._SYSTEM_MSG
+    else:
+      system_message = types.MappingProxyType(
+          {'role': 'system', 'content': system_prompt})
+    # The messages shared by all requests come first and the prompt last, so
+    # that the server can reuse its cache of the shared prefix.
+    self._prefix_messages = (system_message,) + tuple(
+        types.MappingProxyType({'role': role, 'content': content})
+        for user, assistant in few_shot
+        for role, content in (('user', user), ('assistant', assistant))
+    )
+    self._legacy_completions = legacy_completions
+    if (rpm is None) != (tpm is None):
+      raise ValueError('rpm and tpm must be given together.')
+    self._connections = [
+        _Connection(
+            api_key=api_key,
+            client=_get_client(api_key, POE_BASE_URL),
+            rate_limiter=None if rpm is None else rate_limiter.TokenBucket(
+                requests_per_minute=rpm, tokens_per_minute=tpm),
         )
+        for api_key in _api_keys_from_env()
+    ]
+    self._next_connection = 0
+    self._connection_lock = threading.Lock()
+    if use_cache:
+      self._cache = cache if cache is not None else cache_lib.default_backend()
+    else:
+      self._cache = None
+    self._semantic_cache = semantic_cache
+    if concurrency < 1:
+      raise ValueError('concurrency must be at least 1.')
+    self._concurrency = concurrency
+    self._async_states: weakref.WeakKeyDictionary[
+        asyncio.AbstractEventLoop, _AsyncState] = weakref.WeakKeyDictionary()
+    self._async_lock = threading.Lock()
+    self.stats = ClientStats(model_name=model_name)
 
-    self._model_name = model_name
-    self._sleep_periodically = sleep_periodically
+  @contextlib.contextmanager
+  def _connection(self) -> Iterator[_Connection]:
+    """Checks out the connection with the fewest requests in flight.
+
+    Ties are broken round-robin so that sequential callers also use all keys.
+    Errors raised while the connection is checked out are counted in `stats`
+    and adjust the rate limit of the connection.
+    """
+    import openai  # pylint: disable=g-import-not-at-top,redefined-outer-name
+    n = len(self._connections)
+    with self._connection_lock:
+      start = self._next_connection
+      self._next_connection = (start + 1) % n
+      connection = min(
+          (self._connections[(start + i) % n] for i in range(n)),
+          key=lambda c: c.in_flight,
+      )
+      connection.in_flight += 1
+    try:
+      yield connection
+    except openai.RateLimitError:
+      if connection.rate_limiter is not None:
+        connection.rate_limiter.decrease()
+      self.stats.increment('rate_limited')
+      raise
+    except Exception as e:  # pylint: disable=broad-exception-caught
+      if _is_retryable(e):
+        self.stats.increment('transient')
+      raise
+    else:
+      if connection.rate_limiter is not None:
+        connection.rate_limiter.increase()
+    finally:
+      with self._connection_lock:
+        connection.in_flight -= 1
+
+  def _request(
+      self,
+      prompt: str,
+      *,
+      max_tokens: int,
+      terminators: Collection[str],
+      temperature: float,
+      timeout: float,
+      seed: int | None,
+  ) -> dict[str, Any]:
+    """Returns the arguments of a chat completion request."""
+    return dict(
+        self._body(
+            prompt,
+            max_tokens=max_tokens,
+            terminators=terminators,
+            temperature=temperature,
+            seed=seed,
+        ),
+        timeout=timeout,
+        stream=True,
+    )
 
+  def _body(
+      self,
+      prompt: str,
+      *,
+      max_tokens: int,
+      terminators: Collection[str],
+      temperature: float,
+      seed: int | None,
+  ) -> dict[str, Any]:
+    """Returns the body of a chat completion request."""
+    body = dict(
+        model=self._model_name,
+        messages=(*self._prefix_messages, {'role': 'user', 'content': prompt}),
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stop=_stop_sequences(terminators),
+    )
+    if seed is not None:
+      body['seed'] = seed
+    return body
 
-    # Configuration for periodic sleeping to manage rate limits.
-    self._calls_between_sleeping = 10
-    self._n_calls = 0
+  @_retry
+  def _create(
+      self,
+      request: dict[str, Any],
+      tokens: int,
+      terminators: Collection[str],
+  ) -> str:
+    """Sends a chat completion request and returns the response text.
 
-    self._client = openai.OpenAI(
-    api_key=os.getenv("POE_API_KEY"), # https://poe.com/api_key
-    base_url="https://api.poe.com/v1",
-)
+    The response is streamed and the stream is closed as soon as a terminator
+    appears, so we do not wait (or pay) for text that would be truncated.
+    Transient errors are retried with jittered exponential backoff, and every
+    attempt goes through the rate limiter, if any.
+
+    Args:
+      request: Arguments of the request, see `_request`.
+      tokens: Estimated number of tokens used by the request.
+      terminators: Strings that end the response.
+    """
+    with self._connection() as connection:
+      if connection.rate_limiter is not None:
+        connection.rate_limiter.acquire(tokens)
+      stream = connection.client.chat.completions.create(**request)
+      scanner = _TerminatorScanner(terminators)
+      with stream:
+        for chunk in stream:
+          if chunk.choices and scanner.feed(
+              chunk.choices[0].delta.content or ''):
+            break
+    return scanner.text
+
+  @_retry
+  async def _create_async(
+      self,
+      clients: Mapping[str, openai.AsyncOpenAI],
+      request: dict[str, Any],
+      tokens: int,
+      terminators: Collection[str],
+  ) -> str:
+    """Async version of `_create` using the async client of each key."""
+    with self._connection() as connection:
+      if connection.rate_limiter is not None:
+        await connection.rate_limiter.acquire_async(tokens)
+      client = clients[connection.api_key]
+      stream = await client.chat.completions.create(**request)
+      scanner = _TerminatorScanner(terminators)
+      async with stream:
+        async for chunk in stream:
+          if chunk.choices and scanner.feed(
+              chunk.choices[0].delta.content or ''):
+            break
+    return scanner.text
+
+  @_retry
+  def _create_completions(
+      self, request: dict[str, Any], tokens: int) -> list[str]:
+    """Sends a legacy completion request with a list of prompts.
+
+    Not to be confused with the batch API (see `submit_batch`): this is a
+    single synchronous request.
+
+    Args:
+      request: Arguments of the request. `request['prompt']` is a list.
+      tokens: Estimated number of tokens used by the request.
+
+    Returns:
+      The response text for each prompt, in order.
+    """
+    with self._connection() as connection:
+      if connection.rate_limiter is not None:
+        connection.rate_limiter.acquire(tokens)
+      resp = connection.client.completions.create(**request)
+    # Choices are not guaranteed to be in prompt order.
+    texts = [''] * len(request['prompt'])
+    for choice in resp.choices:
+      texts[choice.index] = choice.text or ''
+    return texts
+
+  def _record_bad_request(self, prompts: Sequence[str]) -> None:
+    """Logs a request that the API rejected as invalid."""
+    self.stats.increment('bad_requests')
+    # We log hashes rather than the prompts, which may contain personal data.
+    _LOG.warning(
+        'Poe API rejected the request (model=%s, prompt_hashes=%s).',
+        self._model_name,
+        [utils.prompt_hash(prompt) for prompt in prompts],
+    )
+
+  def _cache_namespace(
+      self,
+      *,
+      max_tokens: int,
+      terminators: Collection[str],
+      temperature: float,
+  ) -> str | None:
+    """Returns a key of all request parameters except the prompt.
+
+    Only deterministic requests are cached so that sampling at a positive
+    temperature keeps returning fresh samples.
+
+    Returns:
+      The key or None if the request is not cacheable.
+    """
+    if temperature > 0 or (
+        self._cache is None and self._semantic_cache is None):
+      return None
+    return cache_lib.make_key(
+        model_name=self._model_name,
+        prefix_messages=[dict(m) for m in self._prefix_messages],
+        max_tokens=max_tokens,
+        temperature=temperature,
+        terminators=tuple(terminators),
+    )
+
+  def _cache_get(self, namespace: str | None, prompt: str) -> str | None:
+    """Looks up an exact and then a semantic match of the prompt."""
+    if namespace is None:
+      return None
+    if self._cache is not None:
+      response = self._cache.get(
+          cache_lib.make_key(namespace=namespace, prompt=prompt))
+      if response is not None:
+        self.stats.increment('cache_hits')
+        return response
+    if self._semantic_cache is not None:
+      response = self._semantic_cache.get(namespace, prompt)
+      if response is not None:
+        self.stats.increment('semantic_cache_hits')
+        return response
+    self.stats.increment('cache_misses')
+    return None
+
+  def _cache_set(
+      self, namespace: str | None, prompt: str, response: str) -> None:
+    # Empty responses signal errors, which we do not want to cache.
+    if namespace is None or not response:
+      return
+    if self._cache is not None:
+      self._cache.set(
+          cache_lib.make_key(namespace=namespace, prompt=prompt), response)
+    if self._semantic_cache is not None:
+      self._semantic_cache.set(namespace, prompt, response)
 
   @override
   def sample_text(
@@ -67,44 +661,556 @@ class PoeClient(base_client.LLMClient):
       timeout: float = base_client.DEFAULT_TIMEOUT_SECONDS,
       seed: int | None = None,
   ) -> str:
+    namespace = self._cache_namespace(
+        max_tokens=max_tokens,
+        terminators=terminators,
+        temperature=temperature,
+    )
+    cached = self._cache_get(namespace, prompt)
+    if cached is not None:
+      return cached
+
+    request = self._request(
+        prompt,
+        max_tokens=max_tokens,
+        terminators=terminators,
+        temperature=temperature,
+        timeout=timeout,
+        seed=seed,
+    )
+    import openai  # pylint: disable=g-import-not-at-top,redefined-outer-name
+    # Rate limit, transient (after retrying) and authentication errors are
+    # raised so that the caller can decide to retry, e.g., the whole batch.
+    try:
+      response_text = self._create(
+          request,
+          rate_limiter.estimate_tokens(prompt, max_tokens),
+          terminators,
+      )
+    except openai.BadRequestError:
+      self._record_bad_request([prompt])
+      return ''
+
+    if not response_text:
+      return ''
+    response_text = utils.truncate(response_text, delimiters=terminators)
+    self._cache_set(namespace, prompt, response_text)
+    return response_text
+
+  def map(
+      self,
+      prompts: Sequence[str],
+      *,
+      max_tokens: int = base_client.DEFAULT_MAX_TOKENS,
+      terminators: Collection[str] = base_client.DEFAULT_TERMINATORS,
+      temperature: float = base_client.DEFAULT_TEMPERATURE,
+      timeout: float = base_client.DEFAULT_TIMEOUT_SECONDS,
+      seed: int | None = None,
+  ) -> list[str]:
+    """Calls `sample_text` for each prompt on a shared thread pool.
+
+    This fans out synchronous calls without an event loop. The API calls
+    release the GIL while waiting on the network, so throughput scales with
+    the number of threads (set with POE_PARALLELISM, default 32) up to the
+    rate limit.
+
+    Args:
+      prompts: The input texts that the model conditions on.
+      max_tokens: The maximum number of tokens in each response.
+      terminators: Each response will be terminated before any of these
+        characters.
+      temperature: Model temperature.
+      timeout: Timeout for each request.
+      seed: Optional seed for the sampling. If None a random seed will be used.
+
+    Returns:
+      The sampled responses, in the same order as `prompts`.
+    """
+    sample = functools.partial(
+        self.sample_text,
+        max_tokens=max_tokens,
+        terminators=terminators,
+        temperature=temperature,
+        timeout=timeout,
+        seed=seed,
+    )
+    return list(self._pool.map(sample, prompts))
+
+  def submit_batch(
+      self,
+      prompts: Sequence[str],
+      *,
+      max_tokens: int = base_client.DEFAULT_MAX_TOKENS,
+      terminators: Collection[str] = base_client.DEFAULT_TERMINATORS,
+      temperature: float = base_client.DEFAULT_TEMPERATURE,
+      seed: int | None = None,
+  ) -> str:
+    """Submits prompts to the batch API.
+
+    Batches are processed asynchronously by the server within 24 hours, at a
+    lower cost than individual requests and without counting towards the
+    per-minute rate limits. Use `fetch_batch` to get the responses.
+
+    Batches and their files belong to the API key that created them, so all
+    batches use the first key.
+
+    Args:
+      prompts: The input texts that the model conditions on.
+      max_tokens: The maximum number of tokens in each response.
+      terminators: Each response will be terminated before any of these
+        characters.
+      temperature: Model temperature.
+      seed: Optional seed for the sampling. If None a random seed will be used.
+
+    Returns:
+      The ID of the batch.
+
+    Raises:
+      openai.NotFoundError: If the API does not support batches.
+    """
+    jsonl = b''.join(
+        orjson.dumps({
+            'custom_id': str(i),
+            'method': 'POST',
+            'url': BATCH_ENDPOINT,
+            'body': self._body(
+                prompt,
+                max_tokens=max_tokens,
+                terminators=terminators,
+                temperature=temperature,
+                seed=seed,
+            ),
+        }, default=dict) + b'\n'
+        for i, prompt in enumerate(prompts)
+    )
+    input_file_id = self._upload_batch_input(jsonl)
+    import openai  # pylint: disable=g-import-not-at-top,redefined-outer-name
+    try:
+      return self._start_batch(input_file_id)
+    except openai.APIError:
+      # Do not leave the uploaded prompts behind.
+      try:
+        self._connections[0].client.files.delete(input_file_id)
+      except openai.APIError:
+        _LOG.warning(
+            'Failed to delete batch input file %s.', input_file_id,
+            exc_info=True)
+      raise
+
+  @_retry
+  def _upload_batch_input(self, jsonl: bytes) -> str:
+    """Uploads the JSONL input of a batch and returns the file's ID."""
+    input_file = self._connections[0].client.files.create(
+        file=('batch.jsonl', jsonl), purpose='batch')
+    return input_file.id
+
+  @_retry
+  def _start_batch(self, input_file_id: str) -> str:
+    """Creates a batch from an uploaded input file and returns its ID."""
+    batch = self._connections[0].client.batches.create(
+        input_file_id=input_file_id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=BATCH_COMPLETION_WINDOW,
+    )
+    return batch.id
+
+  @_retry
+  def _retrieve_batch(self, batch_id: str) -> openai.types.Batch:
+    return self._connections[0].client.batches.retrieve(batch_id)
+
+  def fetch_batch(
+      self,
+      batch_id: str,
+      *,
+      terminators: Collection[str] = base_client.DEFAULT_TERMINATORS,
+      wait: bool = True,
+      num_requests: int | None = None,
+  ) -> list[str] | None:
+    """Returns the responses of a batch submitted with `submit_batch`.
+
+    Args:
+      batch_id: The ID returned by `submit_batch`.
+      terminators: Each response will be terminated before any of these
+        characters.
+      wait: Whether to wait for the batch to finish. The status is polled with
+        exponential backoff.
+      num_requests: Number of prompts submitted in the batch. If None, it is
+        read from the batch's input file.
+
+    Returns:
+      num_requests responses, in the same order as the prompts, or None if
+      the batch is still running and `wait` is False. Requests that failed or
+      did not finish before the batch expired have an empty response.
+
+    Raises:
+      RuntimeError: If the batch failed validation.
     """
-    Generates text by sending a prompt to a specified Poe bot.
+    delay = BATCH_POLL_INITIAL_SECONDS
+    while (batch := self._retrieve_batch(batch_id)).status not in (
+        _BATCH_FINAL_STATUSES):
+      if not wait:
+        return None
+      time.sleep(delay)
+      delay = min(2 * delay, BATCH_POLL_MAX_SECONDS)
+    if batch.status == 'failed':
+      raise RuntimeError(f'Batch {batch_id} failed: {batch.errors}')
+
+    client = self._connections[0].client
+    if num_requests is None:
+      # Neither the output file nor `request_counts` (which is optional)
+      # tells us about requests without a response.
+      lines = client.files.content(batch.input_file_id).content.splitlines()
+      num_requests = sum(1 for line in lines if line.strip())
+    texts = [''] * num_requests
+    num_responses = 0
+    if batch.output_file_id:
+      output = client.files.content(batch.output_file_id)
+      for line in output.content.splitlines():
+        if not line.strip():
+          continue
+        result = orjson.loads(line)
+        response = result.get('response')
+        i = int(result['custom_id'])
+        if not response or response['status_code'] != 200 or not (
+            0 <= i < num_requests):
+          continue
+        text = response['body']['choices'][0]['message']['content'] or ''
+        # Like the other paths, empty responses are not truncated, which
+        # would append the terminators, and are not cached.
+        if text:
+          texts[i] = utils.truncate(text, delimiters=terminators)
+          num_responses += 1
+    if num_responses < num_requests:
+      _LOG.warning(
+          '%d of %d requests in batch %s (status %s) have no response.',
+          num_requests - num_responses, num_requests, batch_id, batch.status)
+    return texts
+
+  def sample_texts(
+      self,
+      prompts: Sequence[str],
+      *,
+      concurrency: int = DEFAULT_CONCURRENCY,
+      max_tokens: int = base_client.DEFAULT_MAX_TOKENS,
+      terminators: Collection[str] = base_client.DEFAULT_TERMINATORS,
+      temperature: float = base_client.DEFAULT_TEMPERATURE,
+      timeout: float = base_client.DEFAULT_TIMEOUT_SECONDS,
+      seed: int | None = None,
+      mode: Literal['concurrent', 'batch'] = 'concurrent',
+  ) -> list[str]:
+    """Samples text for several prompts.
+
+    With `legacy_completions`, all prompts that are not cached are sent in a
+    single request. Otherwise the prompts are sampled concurrently (see
+    `sample_texts_async`).
+
+    Args:
+      prompts: The input texts that the model conditions on.
+      concurrency: Maximum number of requests in flight at any time. Unused
+        with `legacy_completions`.
+      max_tokens: The maximum number of tokens in each response.
+      terminators: Each response will be terminated before any of these
+        characters.
+      temperature: Model temperature.
+      timeout: Timeout for each request.
+      seed: Optional seed for the sampling. If None a random seed will be used.
+      mode: 'batch' sends the prompts that are not cached to the batch API (see
+        `submit_batch`) and blocks until the batch is done, which can take up
+        to 24 hours. Falls back to 'concurrent' if the API does not support
+        batches.
+
+    Returns:
+      The sampled responses, in the same order as `prompts`.
     """
+    if mode not in ('concurrent', 'batch'):
+      raise ValueError(f'Unknown mode: {mode!r}')
+    if mode == 'batch':
+      return self._sample_texts_batch(
+          prompts,
+          concurrency=concurrency,
+          max_tokens=max_tokens,
+          terminators=terminators,
+          temperature=temperature,
+          timeout=timeout,
+          seed=seed,
+      )
+    if not self._legacy_completions:
+      return self._sample_texts_concurrently(
+          prompts,
+          concurrency=concurrency,
+          max_tokens=max_tokens,
+          terminators=terminators,
+          temperature=temperature,
+          timeout=timeout,
+          seed=seed,
+      )
 
-    # --- Rate Limiting ---
-    self._n_calls += 1
-    if self._sleep_periodically and (
-        self._n_calls % self._calls_between_sleeping == 0):
-      print(f'Sleeping for 10 seconds to respect Poe rate limits...')
-      time.sleep(10)
+    namespace = self._cache_namespace(
+        max_tokens=max_tokens,
+        terminators=terminators,
+        temperature=temperature,
+    )
+    responses = [self._cache_get(namespace, prompt) for prompt in prompts]
+    missing = [i for i, response in enumerate(responses) if response is None]
+    if not missing:
+      return responses
 
-    # --- API Call and Response Handling ---
-    response_text = ''
+    request = dict(
+        model=self._model_name,
+        prompt=[prompts[i] for i in missing],
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stop=_stop_sequences(terminators),
+        timeout=timeout,
+    )
+    if seed is not None:
+      request['seed'] = seed
+    tokens = sum(
+        rate_limiter.estimate_tokens(prompts[i], max_tokens) for i in missing)
+    import openai  # pylint: disable=g-import-not-at-top,redefined-outer-name
     try:
-        resp = self._client.chat.completions.create(
-            model=self._model_name,  # Name on Poe
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=temperature,
+      texts = self._create_completions(request, tokens)
+    except openai.BadRequestError:
+      self._record_bad_request(request['prompt'])
+      texts = [''] * len(missing)
+
+    for i, text in zip(missing, texts):
+      if text:
+        text = utils.truncate(text, delimiters=terminators)
+        self._cache_set(namespace, prompts[i], text)
+      responses[i] = text
+    return responses
+
+  def _sample_texts_batch(
+      self,
+      prompts: Sequence[str],
+      *,
+      concurrency: int,
+      max_tokens: int,
+      terminators: Collection[str],
+      temperature: float,
+      timeout: float,
+      seed: int | None,
+  ) -> list[str]:
+    """Samples the prompts that are not cached with the batch API."""
+    namespace = self._cache_namespace(
+        max_tokens=max_tokens,
+        terminators=terminators,
+        temperature=temperature,
+    )
+    responses = [self._cache_get(namespace, prompt) for prompt in prompts]
+    missing = [i for i, response in enumerate(responses) if response is None]
+    if not missing:
+      return responses
+
+    import openai  # pylint: disable=g-import-not-at-top,redefined-outer-name
+    try:
+      batch_id = self.submit_batch(
+          [prompts[i] for i in missing],
+          max_tokens=max_tokens,
+          terminators=terminators,
+          temperature=temperature,
+          seed=seed,
+      )
+    except openai.NotFoundError:
+      _LOG.warning(
+          'Batch API unavailable (model=%s); sampling concurrently.',
+          self._model_name)
+      texts = self._sample_texts_concurrently(
+          [prompts[i] for i in missing],
+          concurrency=concurrency,
+          max_tokens=max_tokens,
+          terminators=terminators,
+          temperature=temperature,
+          timeout=timeout,
+          seed=seed,
+      )
+    else:
+      texts = self.fetch_batch(
+          batch_id, terminators=terminators, num_requests=len(missing))
+      for i, text in zip(missing, texts):
+        self._cache_set(namespace, prompts[i], text)
+
+    # Prompts without a response get '' rather than staying None.
+    texts = list(texts) + [''] * (len(missing) - len(texts))
+    for i, text in zip(missing, texts):
+      responses[i] = text
+    return responses
+
+  def _async_state(self) -> _AsyncState:
+    """Returns the async clients and semaphore of the running event loop.
+
+    aiohttp sessions and asyncio semaphores are bound to an event loop, so
+    they are created once per loop and then shared by all calls on it. This
+    keeps pooled connections alive across calls.
+    """
+    loop = asyncio.get_running_loop()
+    with self._async_lock:
+      state = self._async_states.get(loop)
+      if state is None:
+        state = _AsyncState(
+            clients={
+                connection.api_key: _new_async_client(
+                    connection.api_key, POE_BASE_URL)
+                for connection in self._connections
+            },
+            semaphore=asyncio.Semaphore(self._concurrency),
+        )
+        self._async_states[loop] = state
+    return state
+
+  def _sample_texts_concurrently(
+      self, prompts: Sequence[str], **kwargs: Any) -> list[str]:
+    """Runs `sample_texts_async` on a new event loop.
+
+    Args:
+      prompts: The input texts that the model conditions on.
+      **kwargs: Keyword arguments of `sample_texts_async`.
+    """
+
+    async def sample_texts() -> list[str]:
+      try:
+        return await self.sample_texts_async(prompts, **kwargs)
+      finally:
+        # The event loop is closed once `_run_sync` returns.
+        await self.aclose()
+
+    return _run_sync(sample_texts())
+
+  async def _sample_text_async(
+      self,
+      clients: Mapping[str, openai.AsyncOpenAI],
+      prompt: str,
+      *,
+      max_tokens: int,
+      terminators: Collection[str],
+      temperature: float,
+      timeout: float,
+      seed: int | None,
+  ) -> str:
+    """Samples a single prompt using the given async clients.
+
+    Cache lookups may embed the prompt or query Redis, so they run in a
+    worker thread to keep the event loop responsive.
+    """
+    namespace = self._cache_namespace(
+        max_tokens=max_tokens,
+        terminators=terminators,
+        temperature=temperature,
+    )
+    if namespace is not None:
+      cached = await asyncio.to_thread(self._cache_get, namespace, prompt)
+      if cached is not None:
+        return cached
+
+    request = self._request(
+        prompt,
+        max_tokens=max_tokens,
+        terminators=terminators,
+        temperature=temperature,
+        timeout=timeout,
+        seed=seed,
+    )
+    import openai  # pylint: disable=g-import-not-at-top,redefined-outer-name
+    try:
+      response_text = await self._create_async(
+          clients,
+          request,
+          rate_limiter.estimate_tokens(prompt, max_tokens),
+          terminators,
+      )
+    except openai.BadRequestError:
+      self._record_bad_request([prompt])
+      return ''
+
+    if not response_text:
+      return ''
+    response_text = utils.truncate(response_text, delimiters=terminators)
+    if namespace is not None:
+      await asyncio.to_thread(
+          self._cache_set, namespace, prompt, response_text)
+    return response_text
+
+  async def sample_texts_async(
+      self,
+      prompts: Sequence[str],
+      *,
+      concurrency: int = DEFAULT_CONCURRENCY,
+      max_tokens: int = base_client.DEFAULT_MAX_TOKENS,
+      terminators: Collection[str] = base_client.DEFAULT_TERMINATORS,
+      temperature: float = base_client.DEFAULT_TEMPERATURE,
+      timeout: float = base_client.DEFAULT_TIMEOUT_SECONDS,
+      seed: int | None = None,
+  ) -> list[str]:
+    """Samples text for several prompts concurrently.
+
+    Args:
+      prompts: The input texts that the model conditions on.
+      concurrency: Maximum number of requests in flight at any time.
+      max_tokens: The maximum number of tokens in each response.
+      terminators: Each response will be terminated before any of these
+        characters.
+      temperature: Model temperature.
+      timeout: Timeout for each request.
+      seed: Optional seed for the sampling. If None a random seed will be used.
+
+    Returns:
+      The sampled responses, in the same order as `prompts`.
+    """
+    if concurrency < 1:
+      raise ValueError('concurrency must be at least 1.')
+    semaphore = asyncio.Semaphore(concurrency)
+    clients = self._async_state().clients
+
+    async def sample(prompt: str) -> str:
+      async with semaphore:
+        return await self._sample_text_async(
+            clients,
+            prompt,
             max_tokens=max_tokens,
-            stop=list(terminators) if terminators else None,
-            stream=False,
+            terminators=terminators,
+            temperature=temperature,
+            timeout=timeout,
+            seed=seed,
         )
-    
-        # Extract Model Text Safely
-        response_text = ""
-        if resp and getattr(resp, "choices", None):
-            msg = resp.choices[0].message
-            if msg and getattr(msg, "content", None):
-                response_text = msg.content
-    
-    except Exception as e:
-        # Catching a broad exception as the library might raise various errors
-        # (e.g., connection errors, invalid bot name, token issues).
-        print(f"An error occurred with the Poe API call: {e}")
-        print(f"Bot: {self._model_name}")
-        print(f"Prompt: {prompt}")
-
-    return utils.truncate(response_text, delimiters=terminators) if response_text else ""
+
+    return list(await asyncio.gather(*(sample(p) for p in prompts)))
+
+  async def sample_text_async(
+      self,
+      prompt: str,
+      *,
+      max_tokens: int = base_client.DEFAULT_MAX_TOKENS,
+      terminators: Collection[str] = base_client.DEFAULT_TERMINATORS,
+      temperature: float = base_client.DEFAULT_TEMPERATURE,
+      timeout: float = base_client.DEFAULT_TIMEOUT_SECONDS,
+      seed: int | None = None,
+  ) -> str:
+    """Async version of `sample_text`.
+
+    Concurrent calls on the same event loop share the async clients and are
+    limited to the `concurrency` given to the constructor.
+    """
+    state = self._async_state()
+    async with state.semaphore:
+      return await self._sample_text_async(
+          state.clients,
+          prompt,
+          max_tokens=max_tokens,
+          terminators=terminators,
+          temperature=temperature,
+          timeout=timeout,
+          seed=seed,
+      )
+
+  async def aclose(self) -> None:
+    """Closes the async clients of the running event loop.
+
+    Call this before closing an event loop on which the async methods were
+    used. `sample_texts` closes the clients of the loops it runs itself.
+    """
+    with self._async_lock:
+      state = self._async_states.pop(asyncio.get_running_loop(), None)
+    if state is not None:
+      for client in state.clients.values():
+        await client.close()
@@ -0,0 +1,688 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+import asyncio
+from collections.abc import Iterator
+import copy
+import dataclasses
+import json
+import os
+import pickle
+import threading
+from unittest import mock
+
+from absl.testing import absltest
+import aiohttp
+import httpx
+import openai
+import tenacity
+
+from habermas_machine.llm_client import cache
+from habermas_machine.llm_client import poe_client
+from habermas_machine.llm_client import semantic_cache
+
+# Unpatched client factory.
+_get_client = poe_client._get_client
+
+def _completion_events(content: str, chunk_size: int = 2) -> Iterator[bytes]:
+  """Yields a streamed chat completion as server-sent events."""
+  for i in range(0, len(content), chunk_size):
+    chunk = {
+        'id': 'chatcmpl-mock',
+        'object': 'chat.completion.chunk',
+        'created': 0,
+        'model': 'mock-bot',
+        'choices': [{
+            'index': 0,
+            'delta': {'content': content[i:i + chunk_size]},
+            'finish_reason': None,
+        }],
+    }
+    yield f'data: {json.dumps(chunk)}\n\n'.encode()
+  yield b'data: [DONE]\n\n'
+
+
+def _completion(content: str) -> httpx.Response:
+  return httpx.Response(
+      200,
+      headers={'content-type': 'text/event-stream'},
+      content=b''.join(_completion_events(content)),
+  )
+
+
+def _legacy_completion(prompts: list[str]) -> dict[str, object]:
+  # Choices are returned in reverse order to check that we use their index.
+  return {
+      'id': 'cmpl-mock',
+      'object': 'text_completion',
+      'created': 0,
+      'model': 'mock-bot',
+      'choices': [
+          {'index': i, 'text': prompt.upper(), 'finish_reason': 'stop'}
+          for i, prompt in reversed(list(enumerate(prompts)))
+      ],
+  }
+
+
+def _echo_handler(request: httpx.Request) -> httpx.Response:
+  """Replies with the upper-cased prompt."""
+  body = json.loads(request.content)
+  if request.url.path.endswith('/chat/completions'):
+    return _completion(body['messages'][-1]['content'].upper())
+  return httpx.Response(200, json=_legacy_completion(body['prompt']))
+
+
+def _broken_stream(content: bytes) -> Iterator[bytes]:
+  """Yields the first event of a stream and then fails like a reset."""
+  yield content.split(b'\n\n', 1)[0] + b'\n\n'
+  raise httpx.ReadError('Connection reset by peer')
+
+
+class _MockBatchApi:
+  """Files and batches endpoints that reply to batches with `_echo_handler`."""
+
+  def __init__(self):
+    self.files = {}
+    # Statuses returned by the API, followed by 'completed'.
+    self.statuses = []
+    # Number of requests answered in the output file. None answers all.
+    self.num_outputs = None
+    self.report_request_counts = True
+    # Status codes returned before a batch is created.
+    self.create_failures = []
+    self.bodies = []
+
+  def _file(self, content: bytes) -> dict[str, object]:
+    file_id = f'file-{len(self.files)}'
+    self.files[file_id] = content
+    return {
+        'id': file_id,
+        'object': 'file',
+        'bytes': len(content),
+        'created_at': 0,
+        'filename': 'batch.jsonl',
+        'purpose': 'batch',
+        'status': 'processed',
+    }
+
+  def _batch(self, status: str) -> dict[str, object]:
+    n = len(self.bodies)
+    return {
+        'id': 'batch-0',
+        'object': 'batch',
+        'endpoint': '/v1/chat/completions',
+        'input_file_id': 'file-0',
+        'completion_window': '24h',
+        'status': status,
+        'created_at': 0,
+        'output_file_id': 'file-1' if 'file-1' in self.files else None,
+        'request_counts': (
+            {'total': n, 'completed': n, 'failed': 0}
+            if self.report_request_counts else None),
+    }
+
+  def __call__(self, request: httpx.Request) -> httpx.Response:
+    path = request.url.path
+    if path == '/v1/files':
+      # The JSONL lines are the only JSON objects in the multipart body.
+      lines = [line for line in request.content.splitlines()
+               if line.startswith(b'{')]
+      self.bodies = [json.loads(line)['body'] for line in lines]
+      return httpx.Response(200, json=self._file(b'\n'.join(lines)))
+    if path == '/v1/batches':
+      if self.create_failures:
+        return httpx.Response(
+            self.create_failures.pop(0),
+            json={'error': {'message': 'mock error'}})
+      return httpx.Response(200, json=self._batch('validating'))
+    if path.startswith('/v1/batches/'):
+      status = self.statuses.pop(0) if self.statuses else 'completed'
+      if status in ('completed', 'expired') and 'file-1' not in self.files:
+        results = []
+        lines = self.files['file-0'].splitlines()[:self.num_outputs]
+        for line in lines:
+          line = json.loads(line)
+          content = line['body']['messages'][-1]['content'].upper() or None
+          results.append(json.dumps({
+              'id': 'batch-req',
+              'custom_id': line['custom_id'],
+              'response': {'status_code': 200, 'body': {'choices': [
+                  {'index': 0, 'message': {'content': content}}]}},
+              'error': None,
+          }))
+        self._file('\n'.join(reversed(results)).encode())
+      return httpx.Response(200, json=self._batch(status))
+    if request.method == 'DELETE':
+      file_id = path.split('/')[-1]
+      del self.files[file_id]
+      return httpx.Response(
+          200, json={'id': file_id, 'object': 'file', 'deleted': True})
+    file_id = path.split('/')[-2]
+    return httpx.Response(200, content=self.files[file_id])
+
+
+class TerminatorScannerTest(absltest.TestCase):
+
+  def test_terminator_split_across_deltas(self):
+    scanner = poe_client._TerminatorScanner(['</answer>'])
+    self.assertFalse(scanner.feed('abc</an'))
+    self.assertFalse(scanner.feed('s'))
+    self.assertTrue(scanner.feed('wer>def'))
+    self.assertEqual(scanner.text, 'abc</answer>def')
+
+  def test_no_terminators(self):
+    scanner = poe_client._TerminatorScanner([])
+    self.assertFalse(scanner.feed('abc'))
+    self.assertEqual(scanner.text, 'abc')
+
+
+class ClientStatsTest(absltest.TestCase):
+
+  def test_export(self):
+    stats = poe_client.ClientStats(model_name='mock-bot')
+    stats.increment('cache_hits')
+    counters = {
+        'cache_hits': 1,
+        'semantic_cache_hits': 0,
+        'cache_misses': 0,
+        'rate_limited': 0,
+        'transient': 0,
+        'bad_requests': 0,
+    }
+    self.assertEqual(stats.snapshot(), counters)
+    self.assertEqual(
+        dataclasses.asdict(stats), counters | {'model_name': 'mock-bot'})
+
+  def test_copies_are_independent(self):
+    stats = poe_client.ClientStats(cache_hits=1, model_name='mock-bot')
+    for stats_copy in (copy.deepcopy(stats), pickle.loads(pickle.dumps(stats))):
+      self.assertEqual(stats_copy, stats)
+      self.assertEqual(stats_copy.model_name, 'mock-bot')
+      stats_copy.increment('cache_hits')
+      self.assertEqual(stats_copy.cache_hits, 2)
+    self.assertEqual(stats.cache_hits, 1)
+
+
+class PoeClientTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.enter_context(
+        mock.patch.dict(os.environ, {'POE_API_KEY': 'mock-key'}))
+    self.requests = []
+    # Status codes returned by the API before it starts replying.
+    self.failures = []
+    # Number of streamed responses that break after their first event.
+    self.broken_streams = 0
+    self.batch_api = _MockBatchApi()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+      self.requests.append(request)
+      if self.failures:
+        return httpx.Response(
+            self.failures.pop(0), json={'error': {'message': 'mock error'}})
+      if request.url.path.startswith(('/v1/files', '/v1/batches')):
+        if self.batch_api is None:
+          return httpx.Response(404, json={'error': {'message': 'not found'}})
+        return self.batch_api(request)
+      response = _echo_handler(request)
+      if self.broken_streams and request.url.path.endswith('/chat/completions'):
+        self.broken_streams -= 1
+        return httpx.Response(
+            200,
+            headers={'content-type': 'text/event-stream'},
+            content=_broken_stream(response.content),
+        )
+      return response
+
+    def new_async_client(api_key, base_url):
+      return openai.AsyncOpenAI(
+          api_key=api_key,
+          base_url=base_url,
+          max_retries=0,
+          http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+      )
+
+    def get_client(api_key, base_url):
+      return openai.OpenAI(
+          api_key=api_key,
+          base_url=base_url,
+          max_retries=0,
+          http_client=httpx.Client(transport=httpx.MockTransport(handler)),
+      )
+
+    self.enter_context(
+        mock.patch.object(poe_client, '_new_async_client', new_async_client))
+    self.enter_context(
+        mock.patch.object(poe_client, '_get_client', get_client))
+    for method in (poe_client.PoeClient._create,
+                   poe_client.PoeClient._create_async,
+                   poe_client.PoeClient._upload_batch_input,
+                   poe_client.PoeClient._start_batch):
+      self.enter_context(
+          mock.patch.object(method.retry, 'wait', tenacity.wait_none()))
+
+  def test_missing_api_key_raises(self):
+    with mock.patch.dict(os.environ, clear=True):
+      with self.assertRaises(EnvironmentError):
+        poe_client.PoeClient('mock-bot')
+
+  def test_rate_limit_is_opt_in(self):
+    self.assertIsNone(
+        poe_client.PoeClient('mock-bot')._connections[0].rate_limiter)
+    with self.assertRaises(ValueError):
+      poe_client.PoeClient('mock-bot', rpm=60)
+
+  def test_rate_limiter_is_used_if_configured(self):
+    client = poe_client.PoeClient('mock-bot', rpm=60, tpm=90_000)
+    with mock.patch.object(
+        client._connections[0].rate_limiter, 'acquire') as acquire:
+      client.sample_text('hello', max_tokens=10)
+    acquire.assert_called_once_with(11)
+
+  def test_requests_are_spread_over_api_keys(self):
+    with mock.patch.dict(os.environ, {'POE_API_KEYS': 'key-a, key-b'}):
+      client = poe_client.PoeClient('mock-bot')
+    client.sample_text('a')
+    client.sample_text('b')
+    asyncio.run(client.sample_texts_async(['c', 'd', 'e', 'f']))
+    keys = [r.headers['Authorization'] for r in self.requests]
+    self.assertEqual(keys.count('Bearer key-a'), 3)
+    self.assertEqual(keys.count('Bearer key-b'), 3)
+
+  def test_sample_text(self):
+    client = poe_client.PoeClient('mock-bot')
+    self.assertEqual(client.sample_text('hello'), 'HELLO')
+    self.assertLen(self.requests, 1)
+
+  def test_system_prompt(self):
+    default_client = poe_client.PoeClient('mock-bot')
+    client = poe_client.PoeClient('mock-bot', system_prompt='Be brief.')
+    default_client.sample_text('hello')
+    client.sample_text('hello')
+    self.assertEqual(
+        [json.loads(r.content)['messages'] for r in self.requests],
+        [
+            [{'role': 'system', 'content': poe_client.SYSTEM_PROMPT},
+             {'role': 'user', 'content': 'hello'}],
+            [{'role': 'system', 'content': 'Be brief.'},
+             {'role': 'user', 'content': 'hello'}],
+        ],
+    )
+
+  def test_few_shot_examples_precede_prompt(self):
+    client = poe_client.PoeClient(
+        'mock-bot', system_prompt='Shout.', few_shot=[('hi', 'HI')])
+    client.sample_text('hello')
+    self.assertEqual(
+        json.loads(self.requests[0].content)['messages'],
+        [
+            {'role': 'system', 'content': 'Shout.'},
+            {'role': 'user', 'content': 'hi'},
+            {'role': 'assistant', 'content': 'HI'},
+            {'role': 'user', 'content': 'hello'},
+        ],
+    )
+
+  def test_request_parameters(self):
+    client = poe_client.PoeClient('mock-bot')
+    client.sample_text(
+        'hello',
+        max_tokens=10,
+        terminators=['a', 'b', 'c', 'd', 'e'],
+        temperature=0.5,
+        seed=3,
+    )
+    body = json.loads(self.requests[0].content)
+    self.assertEqual(body['max_tokens'], 10)
+    self.assertEqual(body['stop'], ['a', 'b', 'c', 'd'])
+    self.assertEqual(body['temperature'], 0.5)
+    self.assertEqual(body['seed'], 3)
+
+  def test_fifth_terminator_is_truncated_locally(self):
+    client = poe_client.PoeClient('mock-bot')
+    response = client.sample_text(
+        'xyz', terminators=['a', 'b', 'c', 'd', 'Y'])
+    self.assertEqual(response, 'XY')
+
+  def test_seed_is_omitted_by_default(self):
+    client = poe_client.PoeClient('mock-bot')
+    client.sample_text('hello')
+    self.assertNotIn('seed', json.loads(self.requests[0].content))
+
+  def test_stream_is_closed_at_terminator(self):
+    events_sent = 0
+
+    def events() -> Iterator[bytes]:
+      nonlocal events_sent
+      for event in _completion_events('abc</answer>' + 'x' * 100):
+        events_sent += 1
+        yield event
+
+    def handler(request: httpx.Request) -> httpx.Response:
+      del request
+      return httpx.Response(
+          200, headers={'content-type': 'text/event-stream'}, content=events())
+
+    self.enter_context(mock.patch.object(
+        poe_client, '_get_client',
+        lambda api_key, base_url: openai.OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=httpx.Client(transport=httpx.MockTransport(handler)),
+        )))
+    client = poe_client.PoeClient('mock-bot')
+    self.assertEqual(
+        client.sample_text('hello', terminators=['</answer>']), 'abc</answer>')
+    self.assertLess(events_sent, 10)
+
+  def test_transient_errors_are_retried(self):
+    client = poe_client.PoeClient('mock-bot')
+    self.failures = [429, 503]
+    self.assertEqual(client.sample_text('hello'), 'HELLO')
+    self.assertLen(self.requests, 3)
+    self.assertEqual(
+        client.stats, poe_client.ClientStats(rate_limited=1, transient=1))
+
+  def test_errors_while_streaming_are_retried(self):
+    client = poe_client.PoeClient('mock-bot')
+    self.broken_streams = 1
+    self.assertEqual(client.sample_text('hello'), 'HELLO')
+    self.assertLen(self.requests, 2)
+    self.assertEqual(client.stats, poe_client.ClientStats(transient=1))
+
+  def test_transport_errors_are_retryable(self):
+    self.assertTrue(poe_client._is_retryable(httpx.ReadTimeout('timeout')))
+    self.assertTrue(poe_client._is_retryable(
+        aiohttp.ClientPayloadError('Response payload is not completed')))
+    self.assertFalse(poe_client._is_retryable(ValueError('bug')))
+
+  def test_bad_request_returns_empty_response(self):
+    client = poe_client.PoeClient('mock-bot')
+    self.failures = [400]
+    with self.assertLogs(poe_client._LOG, 'WARNING') as logs:
+      self.assertEqual(client.sample_text('secret prompt'), '')
+    self.assertNotIn('secret prompt', logs.output[0])
+    self.assertLen(self.requests, 1)
+    self.assertEqual(client.stats, poe_client.ClientStats(bad_requests=1))
+
+  def test_authentication_error_is_raised(self):
+    client = poe_client.PoeClient('mock-bot')
+    self.failures = [401]
+    with self.assertRaises(openai.AuthenticationError):
+      client.sample_text('hello')
+    self.assertLen(self.requests, 1)
+
+  def test_retries_are_bounded(self):
+    client = poe_client.PoeClient('mock-bot')
+    self.failures = [500] * poe_client.MAX_ATTEMPTS
+    with self.assertRaises(openai.InternalServerError):
+      client.sample_text('hello')
+    self.assertLen(self.requests, poe_client.MAX_ATTEMPTS)
+    self.assertEqual(client.stats.transient, poe_client.MAX_ATTEMPTS)
+
+  def test_async_transient_errors_are_retried(self):
+    client = poe_client.PoeClient('mock-bot')
+    self.failures = [502]
+    self.assertEqual(asyncio.run(client.sample_text_async('hello')), 'HELLO')
+    self.assertLen(self.requests, 2)
+
+  def test_deterministic_samples_are_cached(self):
+    client = poe_client.PoeClient('mock-bot', cache=cache.InMemoryLRU())
+    self.assertEqual(client.sample_text('hello', temperature=0.0), 'HELLO')
+    self.assertEqual(client.sample_text('hello', temperature=0.0), 'HELLO')
+    self.assertLen(self.requests, 1)
+    self.assertEqual(
+        client.stats, poe_client.ClientStats(cache_hits=1, cache_misses=1))
+
+  def test_stochastic_samples_are_not_cached(self):
+    client = poe_client.PoeClient('mock-bot', cache=cache.InMemoryLRU())
+    client.sample_text('hello', temperature=0.5)
+    client.sample_text('hello', temperature=0.5)
+    self.assertLen(self.requests, 2)
+    self.assertEqual(client.stats, poe_client.ClientStats())
+
+  def test_sample_texts(self):
+    client = poe_client.PoeClient('mock-bot')
+    self.assertEqual(client.sample_texts(['a', 'b']), ['A', 'B'])
+    self.assertLen(self.requests, 2)
+
+  def test_map(self):
+    with mock.patch.dict(os.environ, {'POE_API_KEYS': 'key-a,key-b'}):
+      client = poe_client.PoeClient('mock-bot')
+    prompts = [f'prompt {i}' for i in range(20)]
+    self.assertEqual(client.map(prompts), [p.upper() for p in prompts])
+    self.assertLen(self.requests, 20)
+    self.assertEqual([c.in_flight for c in client._connections], [0, 0])
+
+  def test_sample_texts_in_running_event_loop(self):
+    client = poe_client.PoeClient('mock-bot')
+
+    async def sample():
+      return client.sample_texts(['a', 'b'])
+
+    self.assertEqual(asyncio.run(sample()), ['A', 'B'])
+
+  def test_sample_texts_legacy_completions_batches_prompts(self):
+    client = poe_client.PoeClient(
+        'mock-bot', legacy_completions=True, cache=cache.InMemoryLRU())
+    client.sample_text('b', temperature=0.0)
+    self.requests.clear()
+    responses = client.sample_texts(['a', 'b', 'c'], temperature=0.0)
+    self.assertEqual(responses, ['A', 'B', 'C'])
+    self.assertLen(self.requests, 1)
+    self.assertEqual(json.loads(self.requests[0].content)['prompt'], ['a', 'c'])
+
+  def test_async_cache_lookups_run_off_event_loop(self):
+    threads = []
+
+    class RecordingCache(cache.InMemoryLRU):
+
+      def get(self, key):
+        threads.append(threading.get_ident())
+        return super().get(key)
+
+      def set(self, key, value):
+        threads.append(threading.get_ident())
+        super().set(key, value)
+
+    client = poe_client.PoeClient('mock-bot', cache=RecordingCache())
+
+    async def sample():
+      loop_thread = threading.get_ident()
+      await client.sample_text_async('hello', temperature=0.0)
+      await client.aclose()
+      return loop_thread
+
+    loop_thread = asyncio.run(sample())
+    self.assertLen(threads, 2)
+    self.assertNotIn(loop_thread, threads)
+
+  def test_paraphrased_prompts_hit_semantic_cache(self):
+    semantic = semantic_cache.SemanticCache(
+        embed_fn=lambda texts: [[t.lower().count(c) for c in 'ehlo']
+                                for t in texts])
+    client = poe_client.PoeClient(
+        'mock-bot', use_cache=False, semantic_cache=semantic)
+    self.assertEqual(client.sample_text('hello', temperature=0.0), 'HELLO')
+    semantic.flush()
+    self.assertEqual(client.sample_text('Hello!', temperature=0.0), 'HELLO')
+    self.assertLen(self.requests, 1)
+    self.assertEqual(
+        client.stats,
+        poe_client.ClientStats(semantic_cache_hits=1, cache_misses=1))
+
+  def test_sample_texts_batch_mode(self):
+    client = poe_client.PoeClient('mock-bot')
+    self.assertEqual(
+        client.sample_texts(
+            ['a', 'b<c'], terminators=['<'], temperature=0.0, mode='batch'),
+        ['A<', 'B<'])
+    self.assertEqual(
+        [body['messages'][-1]['content'] for body in self.batch_api.bodies],
+        ['a', 'b<c'])
+    self.assertNotIn('stream', self.batch_api.bodies[0])
+    # Deterministic responses are cached.
+    self.assertEqual(
+        client.sample_texts(
+            ['a'], terminators=['<'], temperature=0.0, mode='batch'),
+        ['A<'])
+    self.assertLen(self.batch_api.bodies, 2)
+
+  def test_fetch_batch_polls_with_backoff(self):
+    self.batch_api.statuses = ['validating', 'in_progress', 'finalizing']
+    client = poe_client.PoeClient('mock-bot')
+    batch_id = client.submit_batch(['a', 'b'])
+    with mock.patch.object(poe_client.time, 'sleep') as sleep:
+      self.assertIsNone(client.fetch_batch(batch_id, wait=False))
+      self.assertEqual(client.fetch_batch(batch_id), ['A', 'B'])
+    self.assertEqual(
+        [c.args[0] for c in sleep.call_args_list],
+        [poe_client.BATCH_POLL_INITIAL_SECONDS,
+         2 * poe_client.BATCH_POLL_INITIAL_SECONDS])
+
+  def test_submit_batch_retries_transient_errors(self):
+    client = poe_client.PoeClient('mock-bot')
+    self.failures = [503]
+    self.batch_api.create_failures = [503]
+    self.assertEqual(client.sample_texts(['a'], mode='batch'), ['A'])
+    self.assertEqual(
+        [r.url.path for r in self.requests[:4]],
+        ['/v1/files', '/v1/files', '/v1/batches', '/v1/batches'])
+
+  def test_input_file_is_deleted_if_batches_are_unsupported(self):
+    self.batch_api.create_failures = [404]
+    client = poe_client.PoeClient('mock-bot')
+    self.assertEqual(
+        client.sample_texts(['a', 'b'], mode='batch'), ['A', 'B'])
+    self.assertEmpty(self.batch_api.files)
+
+  def test_failed_batch_raises(self):
+    self.batch_api.statuses = ['failed']
+    client = poe_client.PoeClient('mock-bot')
+    batch_id = client.submit_batch(['a'])
+    with self.assertRaises(RuntimeError):
+      client.fetch_batch(batch_id)
+
+  def test_empty_batch_responses_are_not_truncated_or_cached(self):
+    fake_cache = cache.InMemoryLRU()
+    client = poe_client.PoeClient('mock-bot', cache=fake_cache)
+    self.assertEqual(
+        client.sample_texts(
+            ['', 'a'], terminators=['</answer>'], temperature=0.0,
+            mode='batch'),
+        ['', 'A</answer>'])
+    self.assertLen(fake_cache._cache, 1)
+
+  def test_partial_batch_is_padded(self):
+    self.batch_api.statuses = ['expired']
+    self.batch_api.num_outputs = 1
+    self.batch_api.report_request_counts = False
+    client = poe_client.PoeClient('mock-bot')
+    self.assertEqual(
+        client.sample_texts(['a', 'b', 'c'], mode='batch'), ['A', '', ''])
+
+  def test_fetch_batch_reads_number_of_requests_from_input_file(self):
+    self.batch_api.statuses = ['expired']
+    self.batch_api.num_outputs = 1
+    self.batch_api.report_request_counts = False
+    client = poe_client.PoeClient('mock-bot')
+    batch_id = client.submit_batch(['a', 'b', 'c'])
+    self.assertEqual(client.fetch_batch(batch_id), ['A', '', ''])
+
+  def test_batch_mode_falls_back_to_concurrent(self):
+    self.batch_api = None
+    client = poe_client.PoeClient('mock-bot')
+    self.assertEqual(
+        client.sample_texts(['a', 'b'], mode='batch'), ['A', 'B'])
+
+  def test_get_client_is_shared(self):
+    _get_client.cache_clear()
+    self.addCleanup(_get_client.cache_clear)
+    with mock.patch.object(poe_client.atexit, 'register'):
+      first = _get_client('key', poe_client.POE_BASE_URL)
+      self.assertIs(first, _get_client('key', poe_client.POE_BASE_URL))
+      self.assertIsNot(first, _get_client('other', poe_client.POE_BASE_URL))
+      # Clients are never evicted, however many keys there are.
+      for i in range(20):
+        _get_client(f'key-{i}', poe_client.POE_BASE_URL)
+      self.assertIs(first, _get_client('key', poe_client.POE_BASE_URL))
+
+  def test_client_accepts_compressed_responses(self):
+    client = _get_client.__wrapped__('key', poe_client.POE_BASE_URL)
+    self.addCleanup(client.close)
+    accept_encoding = client._client.headers['accept-encoding']
+    self.assertContainsSubset(
+        {'br', 'zstd', 'gzip'},
+        {encoding.strip() for encoding in accept_encoding.split(',')},
+    )
+
+  def test_sample_texts_async_preserves_order(self):
+    client = poe_client.PoeClient('mock-bot')
+    prompts = [f'prompt {i}' for i in range(10)]
+    responses = asyncio.run(
+        client.sample_texts_async(prompts, concurrency=3))
+    self.assertEqual(responses, [p.upper() for p in prompts])
+    self.assertLen(self.requests, 10)
+
+  def test_sample_text_async_truncates(self):
+    client = poe_client.PoeClient('mock-bot')
+    response = asyncio.run(
+        client.sample_text_async('a</answer>b', terminators=['</ANSWER>']))
+    self.assertEqual(response, 'A</ANSWER>')
+
+  def test_async_clients_are_shared_on_event_loop(self):
+    client = poe_client.PoeClient(
+        'mock-bot', rpm=1e6, tpm=1e9, concurrency=4)
+    new_async_client = mock.Mock(wraps=poe_client._new_async_client)
+    prompts = [f'p{i}' for i in range(50)]
+
+    async def sample():
+      responses = await asyncio.gather(
+          *(client.sample_text_async(p) for p in prompts))
+      await client.aclose()
+      return responses
+
+    with mock.patch.object(poe_client, '_new_async_client', new_async_client):
+      responses = asyncio.run(sample())
+      client.sample_texts(['a', 'b'])
+    self.assertEqual(responses, [p.upper() for p in prompts])
+    # One client for the event loop above and one for `sample_texts`.
+    self.assertEqual(new_async_client.call_count, 2)
+
+  def test_sample_text_async_calls_are_bounded(self):
+    client = poe_client.PoeClient('mock-bot', concurrency=2)
+    in_flight = []
+    sample_text_async = client._sample_text_async
+
+    async def tracked(*args, **kwargs):
+      in_flight.append(1)
+      self.assertLessEqual(len(in_flight), 2)
+      await asyncio.sleep(0)
+      try:
+        return await sample_text_async(*args, **kwargs)
+      finally:
+        in_flight.pop()
+
+    async def sample():
+      return await asyncio.gather(
+          *(client.sample_text_async(f'p{i}') for i in range(10)))
+
+    with mock.patch.object(client, '_sample_text_async', tracked):
+      self.assertLen(asyncio.run(sample()), 10)
+
+
+if __name__ == '__main__':
+  absltest.main()
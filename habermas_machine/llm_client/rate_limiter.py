@@ -0,0 +1,136 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Client-side rate limiting for LLM APIs."""
+
+import asyncio
+from collections.abc import Callable
+import threading
+import time
+
+# Fraction of the capacity kept when the API reports that we are rate limited.
+DECREASE_FACTOR = 0.8
+
+
+def estimate_tokens(prompt: str, max_tokens: int) -> int:
+  """Returns a rough upper bound on the tokens used by a request."""
+  # English text averages about four characters per token.
+  return len(prompt) // 4 + max_tokens
+
+
+class TokenBucket:
+  """Token bucket limiting both requests and tokens per minute.
+
+  Both budgets refill continuously with the wall-clock time elapsed since the
+  last acquisition, so requests are sent as fast as the limits allow instead
+  of in bursts. When the API rate limits us anyway, `decrease` shrinks the
+  capacity multiplicatively and `increase` recovers it additively on success.
+  The bucket can be shared between threads.
+  """
+
+  def __init__(
+      self,
+      requests_per_minute: float,
+      tokens_per_minute: float,
+      *,
+      clock: Callable[[], float] = time.monotonic,
+  ) -> None:
+    """Initializes the instance.
+
+    Args:
+      requests_per_minute: Maximum number of requests per minute.
+      tokens_per_minute: Maximum number of tokens per minute.
+      clock: Returns the current time in seconds.
+    """
+    if requests_per_minute <= 0 or tokens_per_minute <= 0:
+      raise ValueError('Rate limits must be positive.')
+    self._max_requests_per_minute = requests_per_minute
+    self._max_tokens_per_minute = tokens_per_minute
+    self.requests_per_minute = requests_per_minute
+    self.tokens_per_minute = tokens_per_minute
+    self.available_requests = requests_per_minute
+    self.available_tokens = tokens_per_minute
+    self._clock = clock
+    self._last_update = clock()
+    self._lock = threading.Lock()
+
+  def _refill(self) -> None:
+    now = self._clock()
+    elapsed_minutes = (now - self._last_update) / 60
+    self._last_update = now
+    self.available_requests = min(
+        self.requests_per_minute,
+        self.available_requests + elapsed_minutes * self.requests_per_minute,
+    )
+    self.available_tokens = min(
+        self.tokens_per_minute,
+        self.available_tokens + elapsed_minutes * self.tokens_per_minute,
+    )
+
+  def try_acquire(self, tokens: int) -> float:
+    """Acquires capacity for one request if available.
+
+    Args:
+      tokens: Estimated number of tokens used by the request.
+
+    Returns:
+      0 if the capacity was acquired, otherwise the number of seconds to wait
+      before trying again.
+    """
+    with self._lock:
+      self._refill()
+      # Requests larger than the bucket must still be able to go through.
+      tokens = min(tokens, self.tokens_per_minute)
+      if self.available_requests >= 1 and self.available_tokens >= tokens:
+        self.available_requests -= 1
+        self.available_tokens -= tokens
+        return 0.0
+      missing_requests = max(0.0, 1 - self.available_requests)
+      missing_tokens = max(0.0, tokens - self.available_tokens)
+      return 60 * max(
+          missing_requests / self.requests_per_minute,
+          missing_tokens / self.tokens_per_minute,
+      )
+
+  def acquire(self, tokens: int) -> None:
+    """Blocks until capacity for one request is available and acquires it."""
+    while wait := self.try_acquire(tokens):
+      time.sleep(wait)
+
+  async def acquire_async(self, tokens: int) -> None:
+    """Async version of `acquire`."""
+    while wait := self.try_acquire(tokens):
+      await asyncio.sleep(wait)
+
+  def decrease(self) -> None:
+    """Shrinks the capacity after the API rate limited us."""
+    with self._lock:
+      self.requests_per_minute = max(
+          1.0, self.requests_per_minute * DECREASE_FACTOR)
+      self.tokens_per_minute = max(
+          1.0, self.tokens_per_minute * DECREASE_FACTOR)
+      self.available_requests = min(
+          self.available_requests, self.requests_per_minute)
+      self.available_tokens = min(
+          self.available_tokens, self.tokens_per_minute)
+
+  def increase(self) -> None:
+    """Grows the capacity back towards its maximum after a success."""
+    ratio = self._max_tokens_per_minute / self._max_requests_per_minute
+    with self._lock:
+      self.requests_per_minute = min(
+          self._max_requests_per_minute, self.requests_per_minute + 1)
+      self.tokens_per_minute = min(
+          self._max_tokens_per_minute, self.tokens_per_minute + ratio)
@@ -0,0 +1,80 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+import concurrent.futures
+
+from absl.testing import absltest
+
+from habermas_machine.llm_client import rate_limiter
+
+
+class FakeClock:
+
+  def __init__(self):
+    self.now = 0.0
+
+  def __call__(self) -> float:
+    return self.now
+
+
+class TokenBucketTest(absltest.TestCase):
+
+  def test_request_limit(self):
+    clock = FakeClock()
+    bucket = rate_limiter.TokenBucket(2, 1000, clock=clock)
+    self.assertEqual(bucket.try_acquire(1), 0)
+    self.assertEqual(bucket.try_acquire(1), 0)
+    self.assertAlmostEqual(bucket.try_acquire(1), 30.0)
+    clock.now = 30.0
+    self.assertEqual(bucket.try_acquire(1), 0)
+
+  def test_token_limit(self):
+    clock = FakeClock()
+    bucket = rate_limiter.TokenBucket(100, 600, clock=clock)
+    self.assertEqual(bucket.try_acquire(500), 0)
+    self.assertAlmostEqual(bucket.try_acquire(200), 10.0)
+
+  def test_oversized_request_waits_for_full_bucket(self):
+    clock = FakeClock()
+    bucket = rate_limiter.TokenBucket(100, 600, clock=clock)
+    self.assertEqual(bucket.try_acquire(10_000), 0)
+    self.assertAlmostEqual(bucket.try_acquire(10_000), 60.0)
+
+  def test_thread_safe(self):
+    bucket = rate_limiter.TokenBucket(1000, 100_000, clock=FakeClock())
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+      waits = list(executor.map(lambda _: bucket.try_acquire(10), range(1000)))
+    self.assertEqual(waits, [0] * 1000)
+    self.assertAlmostEqual(bucket.available_requests, 0)
+    self.assertAlmostEqual(bucket.available_tokens, 90_000)
+    self.assertGreater(bucket.try_acquire(10), 0)
+
+  def test_decrease_and_increase(self):
+    bucket = rate_limiter.TokenBucket(10, 1000, clock=FakeClock())
+    bucket.decrease()
+    self.assertAlmostEqual(bucket.requests_per_minute, 8)
+    self.assertAlmostEqual(bucket.tokens_per_minute, 800)
+    self.assertAlmostEqual(bucket.available_requests, 8)
+    bucket.increase()
+    self.assertAlmostEqual(bucket.requests_per_minute, 9)
+    self.assertAlmostEqual(bucket.tokens_per_minute, 900)
+    bucket.increase()
+    bucket.increase()
+    self.assertAlmostEqual(bucket.requests_per_minute, 10)
+    self.assertAlmostEqual(bucket.tokens_per_minute, 1000)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,228 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Response cache that also matches paraphrased prompts.
+
+Prompts are embedded with a sentence encoder and a cached response is returned
+if a previous prompt is close enough in embedding space. FAISS is used for the
+nearest-neighbor search if it is installed, otherwise a brute-force search in
+numpy.
+"""
+
+from collections.abc import Callable, Sequence
+import functools
+import logging
+import queue
+import threading
+import time
+import types
+
+import numpy as np
+
+DEFAULT_THRESHOLD = 0.95
+DEFAULT_MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+# Maximum number of entries per namespace.
+DEFAULT_MAXSIZE = 10_000
+DEFAULT_TTL_SECONDS = 3600
+# Number of rows allocated for the embeddings of a new namespace.
+_INITIAL_CAPACITY = 16
+
+EmbedFn = Callable[[Sequence[str]], np.ndarray]
+
+_LOG = logging.getLogger(__name__)
+
+
+@functools.cache
+def _faiss() -> types.ModuleType | None:
+  """Returns the faiss module, imported on first use, or None."""
+  try:
+    import faiss  # pylint: disable=g-import-not-at-top
+  except ImportError:
+    return None
+  return faiss
+
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+  """L2-normalizes rows so that inner products are cosine similarities."""
+  embeddings = np.asarray(embeddings, dtype=np.float32)
+  norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+  return embeddings / np.maximum(norms, 1e-12)
+
+
+def _sentence_transformer_embed_fn(model_name: str) -> EmbedFn:
+  """Returns an embedding function backed by sentence-transformers."""
+  try:
+    import sentence_transformers  # pylint: disable=g-import-not-at-top
+  except ImportError as e:
+    raise ImportError(
+        'SemanticCache requires sentence-transformers unless embed_fn is '
+        'given: pip install sentence-transformers'
+    ) from e
+  model = sentence_transformers.SentenceTransformer(model_name)
+  return model.encode
+
+
+class _Index:
+  """Nearest-neighbor index over at most `maxsize` normalized embeddings.
+
+  Entries are stored in a ring buffer: once the index is full, each new entry
+  replaces the oldest one.
+  """
+
+  def __init__(self, dim: int, maxsize: int) -> None:
+    faiss = _faiss()
+    if faiss is not None:
+      self._faiss_index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+    else:
+      self._faiss_index = None
+      self._embeddings = np.zeros((0, dim), dtype=np.float32)
+    self._maxsize = maxsize
+    self._next = 0
+    self._responses = []
+    self._times = []
+
+  def add(self, embedding: np.ndarray, response: str, added: float) -> None:
+    slot = self._next
+    self._next = (slot + 1) % self._maxsize
+    if self._faiss_index is not None:
+      ids = np.array([slot], dtype=np.int64)
+      if slot < len(self._responses):
+        self._faiss_index.remove_ids(ids)
+      self._faiss_index.add_with_ids(embedding, ids)
+    else:
+      if slot == len(self._embeddings):
+        # Grow geometrically so that adding stays amortized O(1).
+        capacity = min(self._maxsize, max(_INITIAL_CAPACITY, 2 * slot))
+        embeddings = np.zeros(
+            (capacity, self._embeddings.shape[1]), dtype=np.float32)
+        embeddings[:slot] = self._embeddings
+        self._embeddings = embeddings
+      self._embeddings[slot] = embedding[0]
+    if slot == len(self._responses):
+      self._responses.append(response)
+      self._times.append(added)
+    else:
+      self._responses[slot] = response
+      self._times[slot] = added
+
+  def search(self, embedding: np.ndarray) -> tuple[float, str, float] | None:
+    """Returns the similarity, response and time added of the nearest entry."""
+    if not self._responses:
+      return None
+    if self._faiss_index is not None:
+      similarities, ids = self._faiss_index.search(embedding, 1)
+      similarity, i = float(similarities[0][0]), int(ids[0][0])
+    else:
+      similarities = self._embeddings[:len(self._responses)] @ embedding[0]
+      i = int(np.argmax(similarities))
+      similarity = float(similarities[i])
+    return similarity, self._responses[i], self._times[i]
+
+
+class SemanticCache:
+  """Cache returning the response of the most similar previous prompt.
+
+  Entries are grouped in namespaces (e.g. one per model and sampling
+  parameters) so that only responses to otherwise identical requests are
+  returned. New entries are embedded on a background daemon thread so that
+  `set` does not delay the caller. Each namespace keeps at most `maxsize`
+  entries, evicting the oldest first, and entries expire after `ttl` seconds.
+  """
+
+  def __init__(
+      self,
+      threshold: float = DEFAULT_THRESHOLD,
+      *,
+      embed_fn: EmbedFn | None = None,
+      model_name: str = DEFAULT_MODEL_NAME,
+      maxsize: int = DEFAULT_MAXSIZE,
+      ttl: float = DEFAULT_TTL_SECONDS,
+      clock: Callable[[], float] = time.monotonic,
+  ) -> None:
+    """Initializes the instance.
+
+    Args:
+      threshold: Minimum cosine similarity for a cached response to be
+        returned.
+      embed_fn: Maps a sequence of texts to a 2D array of embeddings. Defaults
+        to the sentence-transformers model `model_name`, loaded on first use.
+      model_name: sentence-transformers model used if `embed_fn` is None.
+      maxsize: Maximum number of entries per namespace.
+      ttl: Time to live of each entry in seconds.
+      clock: Returns the current time in seconds.
+    """
+    if maxsize < 1:
+      raise ValueError('maxsize must be at least 1.')
+    self._threshold = threshold
+    self._embed_fn = embed_fn
+    self._model_name = model_name
+    self._maxsize = maxsize
+    self._ttl = ttl
+    self._clock = clock
+    self._indices: dict[str, _Index] = {}
+    # Guards the indices.
+    self._lock = threading.Lock()
+    # Guards loading the embedding model, which can take a while, so that
+    # lookups in other threads are not blocked meanwhile.
+    self._embed_fn_lock = threading.Lock()
+    self._pending = queue.Queue()
+    self._worker = threading.Thread(target=self._add_pending, daemon=True)
+    self._worker.start()
+
+  def _embed(self, text: str) -> np.ndarray:
+    with self._embed_fn_lock:
+      if self._embed_fn is None:
+        self._embed_fn = _sentence_transformer_embed_fn(self._model_name)
+      embed_fn = self._embed_fn
+    return _normalize(embed_fn([text]))
+
+  def _add_pending(self) -> None:
+    while True:
+      namespace, prompt, response, added = self._pending.get()
+      try:
+        embedding = self._embed(prompt)
+        with self._lock:
+          if namespace not in self._indices:
+            self._indices[namespace] = _Index(
+                embedding.shape[1], self._maxsize)
+          self._indices[namespace].add(embedding, response, added)
+      except Exception:  # pylint: disable=broad-exception-caught
+        # The entry is dropped, but the worker must keep serving later ones.
+        _LOG.exception('Failed to add an entry to the semantic cache.')
+      finally:
+        self._pending.task_done()
+
+  def get(self, namespace: str, prompt: str) -> str | None:
+    """Returns the response to the most similar prompt, if similar enough."""
+    with self._lock:
+      if namespace not in self._indices:
+        return None
+    embedding = self._embed(prompt)
+    with self._lock:
+      result = self._indices[namespace].search(embedding)
+    if result is None:
+      return None
+    similarity, response, added = result
+    if similarity < self._threshold or self._clock() - added > self._ttl:
+      return None
+    return response
+
+  def set(self, namespace: str, prompt: str, response: str) -> None:
+    """Schedules adding the response to the cache."""
+    self._pending.put((namespace, prompt, response, self._clock()))
+
+  def flush(self) -> None:
+    """Blocks until all scheduled responses have been added."""
+    self._pending.join()
@@ -0,0 +1,150 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from collections.abc import Sequence
+from unittest import mock
+
+from absl.testing import absltest
+from absl.testing import parameterized
+import numpy as np
+
+from habermas_machine.llm_client import semantic_cache
+
+
+def letter_counts(texts: Sequence[str]) -> np.ndarray:
+  """Embeds texts as counts of the letters a-z."""
+  embeddings = np.zeros((len(texts), 26))
+  for i, text in enumerate(texts):
+    for c in text.lower():
+      if 'a' <= c <= 'z':
+        embeddings[i, ord(c) - ord('a')] += 1
+  return embeddings
+
+
+def one_hot(i: int, dim: int = 4) -> np.ndarray:
+  embedding = np.zeros((1, dim), dtype=np.float32)
+  embedding[0, i] = 1
+  return embedding
+
+
+class IndexTest(parameterized.TestCase):
+  """Tests both the FAISS and the numpy implementation of the index."""
+
+  def setUp(self):
+    super().setUp()
+    self.faiss = semantic_cache._faiss()
+
+  def index(self, use_faiss: bool, maxsize: int) -> semantic_cache._Index:
+    """Returns an empty index of 4-dimensional embeddings."""
+    if use_faiss and self.faiss is None:
+      self.skipTest('faiss is not installed.')
+    faiss = self.faiss if use_faiss else None
+    with mock.patch.object(semantic_cache, '_faiss', return_value=faiss):
+      return semantic_cache._Index(4, maxsize)
+
+  @parameterized.named_parameters(('faiss', True), ('numpy', False))
+  def test_search_returns_nearest_entry(self, use_faiss):
+    index = self.index(use_faiss, maxsize=4)
+    self.assertIsNone(index.search(one_hot(0)))
+    index.add(one_hot(0), 'a', 1.0)
+    index.add(one_hot(1), 'b', 2.0)
+    self.assertEqual(index.search(one_hot(1)), (1.0, 'b', 2.0))
+
+  @parameterized.named_parameters(('faiss', True), ('numpy', False))
+  def test_full_index_overwrites_oldest_entry(self, use_faiss):
+    index = self.index(use_faiss, maxsize=2)
+    for i, response in enumerate('abc'):
+      index.add(one_hot(i), response, float(i))
+    self.assertEqual(index.search(one_hot(2)), (1.0, 'c', 2.0))
+    self.assertEqual(index.search(one_hot(1)), (1.0, 'b', 1.0))
+    similarity, response, _ = index.search(one_hot(0))
+    self.assertEqual(similarity, 0.0)
+    self.assertIn(response, ('b', 'c'))
+
+
+class SemanticCacheTest(absltest.TestCase):
+
+  def test_returns_response_of_similar_prompt(self):
+    cache = semantic_cache.SemanticCache(embed_fn=letter_counts)
+    cache.set('ns', 'What is the capital of France?', 'Paris')
+    cache.flush()
+    self.assertEqual(cache.get('ns', 'what is the capital of france'), 'Paris')
+
+  def test_dissimilar_prompt_misses(self):
+    cache = semantic_cache.SemanticCache(embed_fn=letter_counts)
+    cache.set('ns', 'What is the capital of France?', 'Paris')
+    cache.flush()
+    self.assertIsNone(cache.get('ns', 'Summarize the opinions below.'))
+
+  def test_namespaces_are_separate(self):
+    cache = semantic_cache.SemanticCache(embed_fn=letter_counts)
+    cache.set('ns', 'hello', 'world')
+    cache.flush()
+    self.assertIsNone(cache.get('other', 'hello'))
+
+  def test_returns_nearest_neighbor(self):
+    cache = semantic_cache.SemanticCache(threshold=0.0, embed_fn=letter_counts)
+    cache.set('ns', 'aaa', 'a')
+    cache.set('ns', 'bbb', 'b')
+    cache.flush()
+    self.assertEqual(cache.get('ns', 'bb'), 'b')
+
+  def test_oldest_entries_are_evicted(self):
+    cache = semantic_cache.SemanticCache(maxsize=2, embed_fn=letter_counts)
+    for prompt in ('aaa', 'bbb', 'ccc'):
+      cache.set('ns', prompt, prompt.upper())
+    cache.flush()
+    self.assertIsNone(cache.get('ns', 'aaa'))
+    self.assertEqual(cache.get('ns', 'bbb'), 'BBB')
+    self.assertEqual(cache.get('ns', 'ccc'), 'CCC')
+
+  def test_index_grows_past_initial_capacity(self):
+    cache = semantic_cache.SemanticCache(embed_fn=letter_counts)
+    prompts = [chr(ord('a') + i) * 3 for i in range(26)]
+    for prompt in prompts:
+      cache.set('ns', prompt, prompt.upper())
+    cache.flush()
+    for prompt in prompts:
+      self.assertEqual(cache.get('ns', prompt), prompt.upper())
+
+  def test_entries_expire(self):
+    now = 0.0
+    cache = semantic_cache.SemanticCache(
+        ttl=10, embed_fn=letter_counts, clock=lambda: now)
+    cache.set('ns', 'hello', 'world')
+    cache.flush()
+    now = 10.0
+    self.assertEqual(cache.get('ns', 'hello'), 'world')
+    now = 10.5
+    self.assertIsNone(cache.get('ns', 'hello'))
+
+  def test_embedding_error_does_not_stop_worker(self):
+
+    def embed(texts: Sequence[str]) -> np.ndarray:
+      if texts == ['fail']:
+        raise ValueError('mock error')
+      return letter_counts(texts)
+
+    cache = semantic_cache.SemanticCache(embed_fn=embed)
+    with self.assertLogs(semantic_cache.__name__, 'ERROR'):
+      cache.set('ns', 'fail', 'lost')
+      cache.flush()
+    cache.set('ns', 'hello', 'world')
+    cache.flush()
+    self.assertEqual(cache.get('ns', 'hello'), 'world')
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -18,6 +18,16 @@
 from collections.abc import Collection
 import sys
 
+import blake3
+
+# Length of the digests returned by `prompt_hash` in bytes.
+PROMPT_HASH_SIZE = 8
+
+
+def prompt_hash(prompt: str) -> str:
+  """Returns a short hash identifying a prompt in logs without revealing it."""
+  return blake3.blake3(prompt.encode()).hexdigest(PROMPT_HASH_SIZE)
+
 
 def truncate(
     string: str,
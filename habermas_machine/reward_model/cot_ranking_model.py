@@ -16,6 +16,7 @@
 """A ranking model that uses chain-of-thought reasoning."""
 
 from collections.abc import Sequence
+import logging
 import re
 
 import numpy as np
@@ -24,6 +25,8 @@ from typing_extensions import override
 from habermas_machine.llm_client import base_client
 from habermas_machine.reward_model import base_model
 
+_LOG = logging.getLogger(__name__)
+
 
 class COTRankingModel(base_model.BaseRankingModel):
   """A ranking model that uses chain-of-thought reasoning to rank statements."""
@@ -71,9 +74,9 @@ class COTRankingModel(base_model.BaseRankingModel):
       else:
         if seed is not None:
           seed += 1
-          print(
-              'Retrying with new seed. Explanation:'
-              f' {ranking_result.explanation}'
+          _LOG.info(
+              'Retrying with new seed. Explanation: %s',
+              ranking_result.explanation,
           )
 
     # If we reach here, all retries failed. return the last result.
@@ -16,12 +16,14 @@
 """A model that uses the chain-of-thought method to generate statements."""
 
 from collections.abc import Sequence
-
+import logging
 import re
 
 from habermas_machine.llm_client import base_client
 from habermas_machine.statement_model import base_model
 
+_LOG = logging.getLogger(__name__)
+
 
 def _generate_opinion_critique_prompt(
     question: str,
@@ -190,7 +192,7 @@ class COTModel(base_model.BaseStatementModel):
       else:
         if seed is not None:
           seed += 1
-          print(f'Retrying with new seed. Explanation: {explanation}')
+          _LOG.info('Retrying with new seed. Explanation: %s', explanation)
 
     # If we reach here, all retries failed. Return the last result.
     return base_model.StatementResult(statement, explanation)
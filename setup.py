@@ -43,5 +43,6 @@ setuptools.setup(
         'habermas_machine.social_choice',
         'habermas_machine.statement_model'
     ],
+    package_data={'habermas_machine': ['py.typed']},
     zip_safe=False,
 )